@@ -0,0 +1,4 @@
+from pybricks.hubs import EV3Brick
+
+# Shared by the entry point and the menus; the brick is opened only once.
+ev3 = EV3Brick()
@@ -0,0 +1,42 @@
+from pybricks.ev3devices import Motor
+from pybricks.parameters import Stop, Direction
+
+from compat import uasyncio
+
+
+class Catapult:
+    # Release motor speeds that drive it into its end stops.
+    RELEASE_SPEED = 500
+    LOCK_SPEED = -500
+
+    def __init__(self, tension_port, release_port):
+        self.release_motor = Motor(release_port, positive_direction=Direction.COUNTERCLOCKWISE)
+
+    def startup(self):
+        self.lock()
+
+    def lock(self):
+        self.release_motor.run_until_stalled(self.LOCK_SPEED, then=Stop.HOLD)
+
+    async def _run_until_stalled(self, speed, then=Stop.COAST):
+        # Like Motor.run_until_stalled, but yields to the event loop while
+        # the motor moves.
+        motor = self.release_motor
+        motor.run(speed)
+        while not motor.control.stalled():
+            await uasyncio.sleep_ms(10)
+        if then == Stop.HOLD:
+            motor.hold()
+        else:
+            motor.stop()
+
+    # def set_tension(self, value):
+    #     if self.min_tension <= value <= self.max_tension:
+    #         self.tension = value
+
+    async def shoot(self):
+        # start_angle = self.tension_motor.angle()
+        # self.tension_motor.run_until_stalled(100, duty_limit=self.tension, then=Stop.HOLD)
+        await self._run_until_stalled(self.RELEASE_SPEED)
+        # self.tension_motor.run_target(300, start_angle)
+        await self._run_until_stalled(self.LOCK_SPEED, then=Stop.HOLD)
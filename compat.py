@@ -0,0 +1,12 @@
+# Names that differ between EV3 MicroPython and CPython, resolved once here
+# so main.py carries no platform branch.
+__all__ = ("uasyncio", "namedtuple")
+
+try:
+    import uasyncio
+    from ucollections import namedtuple
+except ImportError:
+    import asyncio as uasyncio
+    from collections import namedtuple
+
+    uasyncio.sleep_ms = lambda ms: uasyncio.sleep(ms / 1000)
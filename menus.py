@@ -0,0 +1,177 @@
+from pybricks.parameters import Button, Color
+from pybricks.tools import wait
+
+from brick import ev3
+from compat import namedtuple
+from properties import ANGLES
+from util import clamp
+
+Setting = namedtuple("Setting", ("name", "min", "max"))
+
+BUTTON_POLL_MS = 20
+BUTTON_REPEAT_MS = 300
+REPEATING_BUTTONS = (Button.UP, Button.DOWN, Button.LEFT, Button.RIGHT)
+
+# SettingsPage rows; the values live in a parallel list on the page.
+SETTINGS = (
+    Setting("Tension", 40, 100),
+    Setting("Asyq", 1, len(ANGLES)),
+)
+
+
+def _button_dispatch(handlers):
+    # Calls a button's handler when it is pressed. Held arrow buttons repeat
+    # every BUTTON_REPEAT_MS; CENTER fires once per press. Buttons already held
+    # on entry (e.g. the press that opened this screen) are ignored until
+    # released. Returns once a handler returns True.
+    prev = set(ev3.buttons.pressed())
+    repeat = None
+    held = 0
+    while True:
+        cur = set(ev3.buttons.pressed())
+        button = None
+        for b in cur - prev:
+            if b in handlers:
+                button = b
+                break
+        if button is not None:
+            repeat = button if button in REPEATING_BUTTONS else None
+            held = 0
+        elif repeat in cur:
+            held += BUTTON_POLL_MS
+            if held >= BUTTON_REPEAT_MS:
+                held = 0
+                button = repeat
+        else:
+            repeat = None
+        if button is not None and handlers[button]():
+            return
+        prev = cur
+        wait(BUTTON_POLL_MS)
+
+
+class MeasurementScreen:
+    def __init__(self, screen, color_sensor):
+        self.screen = screen
+        self.color_sensor = color_sensor
+
+    def update(self):
+        reflection = self.color_sensor.reflection()
+        self.screen.clear()
+        self.screen.draw_text(50, 50, "{}".format(reflection))
+
+    def process_input(self):
+        while True:
+            if Button.CENTER in ev3.buttons.pressed():
+                break
+            self.update()
+            wait(150)
+
+
+class MainMenu:
+    def __init__(self, screen, player):
+        self.screen = screen
+        self.player = player
+        self.current_item = 0
+        self.items = ["start", "settings"]
+        self.handlers = {
+            Button.UP: self.up,
+            Button.DOWN: self.down,
+            Button.CENTER: self.select,
+        }
+        self.update()
+
+    def update(self):
+        self.screen.clear()
+        for i, item in enumerate(self.items):
+            if self.current_item == i:
+                self.screen.draw_text(5, 20 + 20 * i, ">")
+            self.screen.draw_text(20, 20 + 20 * i, item.upper())
+
+    def up(self):
+        self.current_item = (self.current_item - 1) % len(self.items)
+        self.update()
+
+    def down(self):
+        self.current_item = (self.current_item + 1) % len(self.items)
+        self.update()
+
+    def select(self):
+        if self.current_item == 0:
+            return True
+        setting_page = SettingsPage(self.screen, self.player)
+        setting_page.process_input()
+        self.update()
+
+    def process_input(self):
+        _button_dispatch(self.handlers)
+
+
+class SettingsPage:
+    def __init__(self, screen, player):
+        self.screen = screen
+        self.player = player
+        self.current_item = 0
+        self._descs = SETTINGS
+        self._values = [self.player.tension, self.player.asyq]
+        # What is currently on screen, so update() redraws only what changed.
+        self._rendered = [None] * len(self._descs)
+        self._cursor = None
+        self.handlers = {
+            Button.UP: self.up,
+            Button.DOWN: self.down,
+            Button.LEFT: self.decrease,
+            Button.RIGHT: self.increase,
+            Button.CENTER: self.confirm,
+        }
+        self.update()
+
+    def _erase(self, x1, x2, i):
+        y = 20 + 20 * i
+        self.screen.draw_box(x1, y, x2, y + 19, fill=True, color=Color.WHITE)
+
+    def update(self):
+        screen = self.screen
+        if self._cursor is None:
+            screen.clear()
+        values = self._values
+        rendered = self._rendered
+        for i, desc in enumerate(self._descs):
+            text = "{}: {}".format(desc.name, values[i])
+            if text != rendered[i]:
+                if rendered[i] is not None:
+                    self._erase(20, screen.width - 1, i)
+                screen.draw_text(20, 20 + 20 * i, text)
+                rendered[i] = text
+        if self.current_item != self._cursor:
+            if self._cursor is not None:
+                self._erase(5, 19, self._cursor)
+            screen.draw_text(5, 20 + 20 * self.current_item, ">")
+            self._cursor = self.current_item
+
+    def up(self):
+        self.current_item = (self.current_item - 1) % len(self._descs)
+        self.update()
+
+    def down(self):
+        self.current_item = (self.current_item + 1) % len(self._descs)
+        self.update()
+
+    def change(self, delta):
+        i = self.current_item
+        desc = self._descs[i]
+        self._values[i] = clamp(self._values[i] + delta, desc.min, desc.max)
+        self.update()
+
+    def decrease(self):
+        self.change(-1)
+
+    def increase(self):
+        self.change(1)
+
+    def confirm(self):
+        self.player.tension, self.player.asyq = self._values
+        return True
+
+    def process_input(self):
+        _button_dispatch(self.handlers)
@@ -0,0 +1,326 @@
+from pybricks.ev3devices import Motor, ColorSensor
+from pybricks.parameters import Color
+from pybricks.tools import wait, StopWatch, DataLog
+from pybricks.robotics import DriveBase
+from array import array
+
+from catapult import Catapult
+from compat import uasyncio, namedtuple
+from properties import (
+    TENSION_PORT, RELEASE_PORT, LEFT_WHEEL_PORT, RIGHT_WHEEL_PORT,
+    LEFT_SENSOR_PORT, RIGHT_SENSOR_PORT,
+    AXLE_TRACK, WHEEL_DIAMETER, MAX_SPEED, ANGLES, BW_THRESHOLD,
+    PROPORTIONAL_GAIN, INTEGRAL_GAIN, DERIVATIVE_GAIN, INTEGRAL_LIMIT,
+    INTEGRAL_DEADBAND, FILTER_SHIFT, SAMPLE_PERIOD_MS, CONTROL_PERIOD_MS
+)
+from util import clamp
+
+Snapshot = namedtuple("Snapshot", ("left_color", "right_refl", "time_ms"))
+
+EINTR = 4
+
+# color() hands back these same constant objects, so identity is enough.
+_GREEN = Color.GREEN
+_RED = Color.RED
+
+_THRESHOLD = int(BW_THRESHOLD)
+# Moving-average window over the reflection; a power of two so the ring index
+# is a mask and the mean is a shift.
+_HIST_LEN = 1 << FILTER_SHIFT
+
+
+class Player:
+    MODE_START = 0
+    MODE_WALK_ALONG_LINE = 1
+    MODE_THROW_POSITION = 2
+    MODE_RETURN = 3
+    MODE_FINISH = 4
+
+    BACKWARDS_FACTOR = 0.7
+    # Reversing, steering is inverted and damped.
+    BACKWARDS_STEERING = -0.2
+
+    LOG_BUFFER_SIZE = 128
+    # Start a new log file after this many rows to bound file size.
+    LOG_ROTATE_ROWS = 10000
+
+    def __init__(self):
+        # Motors and sensors are opened in startup(), once the menu is done.
+        self.catapult = None
+        self.drivebase = None
+        self.left_color_sensor = None
+        self.right_color_sensor = None
+        self.mode = self.MODE_START
+        self.drive_speed = 0
+        self.turn_rate = 0
+        self.drive_speed_factor = 1
+        self._effective_speed = 0
+        # True while the current setpoint has not reached the motors.
+        self._drive_pending = False
+
+        self.tension = 60
+        self.asyq = 3
+
+        self.clock = StopWatch()
+        self.snap = Snapshot(None, _THRESHOLD, 0)
+        # Set by _sample on left colour transitions.
+        self.on_green = uasyncio.Event()
+        self.off_green = uasyncio.Event()
+        self.on_red = uasyncio.Event()
+        # Fatal sensor error from _sample, re-raised by run().
+        self._fault = None
+        # PID gains (kp, ki, kd) with the steering direction folded in, kept
+        # on the instance so the controller does no global lookups per tick.
+        self._gains_fwd = (PROPORTIONAL_GAIN, INTEGRAL_GAIN, DERIVATIVE_GAIN)
+        self._gains_back = tuple(g * self.BACKWARDS_STEERING for g in self._gains_fwd)
+        self._threshold = _THRESHOLD
+        self.reset_pid()
+
+        # Ring buffer filled by log() and drained by _log_flusher(). Allocated
+        # up front so logging does not grow the heap during a run.
+        self._log_snaps = [None] * self.LOG_BUFFER_SIZE
+        self._log_turn = [0] * self.LOG_BUFFER_SIZE
+        self._log_idx = 0
+        self._log_flushed = 0
+        self._datalog = None
+        self._datalog_rows = 0
+        self._datalog_part = 0
+
+    def startup(self):
+        self.catapult = Catapult(TENSION_PORT, RELEASE_PORT)
+        self.drivebase = DriveBase(
+            Motor(LEFT_WHEEL_PORT),
+            Motor(RIGHT_WHEEL_PORT),
+            WHEEL_DIAMETER,
+            AXLE_TRACK
+        )
+        self.left_color_sensor = ColorSensor(LEFT_SENSOR_PORT)
+        self.right_color_sensor = ColorSensor(RIGHT_SENSOR_PORT)
+        #self.gyro_sensor = GyroSensor(GYRO_SENSOR_PORT)
+        # The first read after a sensor enters a mode can return a stale
+        # value. Put each sensor into the one mode it uses now, so the first
+        # sample init_routine sees is already valid.
+        self.left_color_sensor.color()
+        self.right_color_sensor.reflection()
+        wait(30)
+        self.catapult.startup()
+        # self.display.startup()
+
+    async def init_routine(self):
+        print("Init start")
+        await self.on_green.wait()
+        print("Init end")
+
+    def forward(self):
+        self.drivebase.reset()
+        self.set_drive(MAX_SPEED, 0)
+        self.reset_pid()
+
+    def backwards(self):
+        self.drivebase.reset()
+        self.set_drive(-MAX_SPEED * self.BACKWARDS_FACTOR, 0)
+        self.reset_pid()
+
+    def reset_pid(self):
+        self._i = 0.0
+        self._prev_filt = 0
+        self._hist = array('h', [_THRESHOLD] * _HIST_LEN)
+        self._hi = 0
+        self._prev_t = self.snap.time_ms
+
+    def set_drive(self, speed, turn):
+        # Actuates straight away; the caller's tick is the drive tick.
+        if speed == self.drive_speed and turn == self.turn_rate and not self._drive_pending:
+            return
+        if speed != self.drive_speed:
+            self.drive_speed = speed
+            self._effective_speed = speed * self.drive_speed_factor
+        self.turn_rate = turn
+        speed = self._effective_speed
+        for _ in range(2):
+            try:
+                if speed == 0:
+                    self.drivebase.stop()
+                else:
+                    self.drivebase.drive(speed, turn)
+                self._drive_pending = False
+                return
+            except OSError as e:
+                if e.args[0] != EINTR:
+                    raise
+        # Interrupted twice; the next set_drive() call retries.
+        self._drive_pending = True
+
+    def stop(self):
+        # No later set_drive() call may come to retry a failed stop, so keep
+        # going until it lands; stopping is idempotent.
+        self.set_drive(0, 0)
+        while self._drive_pending:
+            self.set_drive(0, 0)
+
+    async def start_routine(self):
+        print("Start start")
+        self.forward()
+        await self.off_green.wait()
+        print("Start end")
+
+    def update_speed_turn_rate(self, backwards=False):
+        snap = self.snap
+        dt = (snap.time_ms - self._prev_t) / 1000
+        if dt <= 0:
+            return
+        self._prev_t = snap.time_ms
+        hist = self._hist
+        hi = self._hi = (self._hi + 1) & (_HIST_LEN - 1)
+        hist[hi] = snap.right_refl
+        filt = (sum(hist) >> FILTER_SHIFT) - self._threshold
+        d = (filt - self._prev_filt) / dt
+        self._prev_filt = filt
+        i = self._i
+        if filt > INTEGRAL_DEADBAND or filt < -INTEGRAL_DEADBAND:
+            i = self._i = clamp(i + filt * dt, -INTEGRAL_LIMIT, INTEGRAL_LIMIT)
+        kp, ki, kd = self._gains_back if backwards else self._gains_fwd
+        self.set_drive(self.drive_speed, kp * filt + ki * i + kd * d)
+
+    async def walk_along_line_forward(self):
+        print("WALF start")
+        update = self.update_speed_turn_rate
+        sleep_ms = uasyncio.sleep_ms
+        on_red = self.on_red
+        while not on_red.is_set():
+            update()
+            await sleep_ms(CONTROL_PERIOD_MS)
+        print("WALF end")
+
+    async def throw_routine(self):
+        print("Throw start")
+        self.stop()
+        await uasyncio.sleep_ms(200)
+        angle = ANGLES[self.asyq - 1]
+        self.drivebase.turn(angle)
+        #self.catapult.set_tension(self.tension)
+        await self.catapult.shoot()
+        self.drivebase.turn(-angle)
+        print("Throw end")
+
+    async def walk_along_line_backwards(self):
+        print("WALB start")
+        self.backwards()
+        await uasyncio.sleep_ms(100)
+        print("WALB while color")
+        update = self.update_speed_turn_rate
+        sleep_ms = uasyncio.sleep_ms
+        on_green = self.on_green
+        while not on_green.is_set():
+            update(True)
+            await sleep_ms(CONTROL_PERIOD_MS)
+        self.stop()
+        print("WALB end")
+
+    async def _sample(self):
+        # The only place sensors are read; control and logging use self.snap.
+        # Each sensor is only ever read in one mode (left: color, right:
+        # reflection), since switching modes stalls the next reading.
+        left_color = self.left_color_sensor.color
+        right_refl = self.right_color_sensor.reflection
+        now = self.clock.time
+        on_green = self.on_green
+        off_green = self.off_green
+        on_red = self.on_red
+        sleep_ms = uasyncio.sleep_ms
+        while True:
+            try:
+                snap = Snapshot(left_color(), right_refl(), now())
+            except OSError as e:
+                if e.args[0] != EINTR:
+                    # Nothing awaits this task, so hand the error to run():
+                    # stop the motors and wake whichever routine is waiting.
+                    self._fault = e
+                    self.stop()
+                    on_green.set()
+                    off_green.set()
+                    on_red.set()
+                    return
+                # Drop the sample; consumers keep using the previous one.
+                await sleep_ms(SAMPLE_PERIOD_MS)
+                continue
+            color = snap.left_color
+            if color is not self.snap.left_color:
+                if color is _GREEN:
+                    on_green.set()
+                    off_green.clear()
+                else:
+                    on_green.clear()
+                    off_green.set()
+                if color is _RED:
+                    on_red.set()
+                else:
+                    on_red.clear()
+            self.snap = snap
+            await sleep_ms(SAMPLE_PERIOD_MS)
+
+    async def run(self):
+        try:
+            for routine in (
+                self.init_routine,
+                self.start_routine,
+                self.walk_along_line_forward,
+                self.throw_routine,
+                self.walk_along_line_backwards,
+            ):
+                await routine()
+                if self._fault is not None:
+                    raise self._fault
+        finally:
+            # Never leave the robot driving, whichever way the run ends.
+            self.stop()
+        # Write out the tail that has not reached a full batch yet.
+        self.flush_log()
+
+    async def log(self):
+        size = self.LOG_BUFFER_SIZE
+        while True:
+            i = self._log_idx % size
+            self._log_snaps[i] = self.snap
+            self._log_turn[i] = self.turn_rate
+            self._log_idx += 1
+            await uasyncio.sleep_ms(100)
+
+    def _open_datalog(self):
+        self._datalog = DataLog(
+            "left_color",
+            "right_reflection",
+            #"gyro_angle",
+            "turn_rate",
+            name="log_{}".format(self._datalog_part)
+        )
+        self._datalog_part += 1
+        self._datalog_rows = 0
+
+    def flush_log(self):
+        size = self.LOG_BUFFER_SIZE
+        # Rows older than one ring's worth have been overwritten; skip them
+        # rather than writing stale slots again.
+        self._log_flushed = max(self._log_flushed, self._log_idx - size)
+        while self._log_flushed < self._log_idx:
+            if self._datalog is None or self._datalog_rows >= self.LOG_ROTATE_ROWS:
+                self._open_datalog()
+            datalog = self._datalog
+            i = self._log_flushed % size
+            snap = self._log_snaps[i]
+            datalog.log(
+                snap.left_color,
+                snap.right_refl,
+                #self.gyro_sensor.angle(),
+                self._log_turn[i]
+            )
+            self._log_flushed += 1
+            self._datalog_rows += 1
+
+    async def _log_flusher(self):
+        half = self.LOG_BUFFER_SIZE // 2
+        while True:
+            # Write in bursts of half a buffer instead of one row per sample.
+            if self._log_idx - self._log_flushed >= half:
+                self.flush_log()
+            await uasyncio.sleep_ms(100)
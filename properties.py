@@ -0,0 +1,55 @@
+from pybricks.parameters import Port
+
+CATAPULT_DEFAULT_POWER = 70
+TENSION_PORT = Port.B
+RELEASE_PORT = Port.D
+
+LEFT_WHEEL_PORT = Port.C
+RIGHT_WHEEL_PORT = Port.B
+
+LEFT_SENSOR_PORT = Port.S1
+RIGHT_SENSOR_PORT = Port.S4
+# MIDDLE_SENSOR_PORT = Port.S3
+GYRO_SENSOR_PORT = Port.S4
+
+AXLE_TRACK = 145
+# AXLE_TRACK = 175
+WHEEL_DIAMETER = 56
+
+# The colour sensors refresh about every 20 ms; sampling at twice that rate
+# means each controller tick sees a fresh reading.
+SAMPLE_PERIOD_MS = 10
+CONTROL_PERIOD_MS = 20
+
+# Line follower PID, time-based (per second). Tune KP first, then KD, then KI.
+# At the 20 ms control tick these are KD = 0.15 and KI = 0.01 per tick. The
+# integral is clamped to +/-50 deviation-ticks (+/-1.0 deviation-seconds), which
+# caps the I term at +/-0.5 turn rate: negligible next to the P term.
+PROPORTIONAL_GAIN = 0.5
+INTEGRAL_GAIN = 0.5
+DERIVATIVE_GAIN = 0.003
+INTEGRAL_LIMIT = 1.0
+# Deviations this small are treated as noise and not integrated
+INTEGRAL_DEADBAND = 2
+# The reflection is averaged over the last 2 ** FILTER_SHIFT controller ticks
+FILTER_SHIFT = 3
+# BLACK = 4
+# WHITE = 38
+
+BLACK = 10
+WHITE = 90
+BW_THRESHOLD = (BLACK + WHITE) / 2
+
+TENSION = 76
+DI_BLACK_LEVEL = 0
+DI_WHITE_LEVEL = 1
+DI_THRESHOLD = 2
+
+MAX_SPEED = 100
+
+# Turn angle before the throw, indexed by asyq - 1
+ANGLES = (-10, -3, 0, 3)
+
+
+# TOTAL_DISTANCE = 1150
+TOTAL_DISTANCE = 750
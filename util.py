@@ -0,0 +1,2 @@
+def clamp(value, lo, hi):
+    return lo if value < lo else hi if value > hi else value